@@ -7,6 +7,8 @@ Minimal script to graph PCP pmrep --csv exports (e.g., ds389.cn.opscompleted) on
 - Picks a metric column automatically if you don't pass --metric.
 - Optional --resample and --rolling smoothing.
 - Saves a PNG and (optionally) a single-page PDF.
+- Optional --csv-list FILE to plot many CSVs in one process (one PNG each, one PDF page each).
+- Optional --csv-glob PATTERN --jobs N to plot many CSVs in parallel worker processes.
 
 Usage
 -----
@@ -21,17 +23,54 @@ python3 plot_opscompleted.py --csv ds389_cn_opscompleted_all_pmrep_final.csv \
 python3 plot_opscompleted.py --csv ds389_cn_opscompleted_all_pmrep_final.csv \
   --metric ds389.cn.opscompleted --resample 1min --rolling 5 \
   --out-dir ./plots --pdf ./plots/opscompleted.pdf
+
+# Batch: every CSV listed in csvs.txt, reusing one figure
+python3 plot_opscompleted.py --csv-list csvs.txt --out-dir ./plots
+
+# Parallel: every matching CSV, 8 worker processes
+python3 plot_opscompleted.py --csv-glob '/tmp/*_pmrep_final.csv' --jobs 8 --out-dir ./plots
 """
 import argparse
+import glob
 import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 from typing import Optional, List
 
+import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # headless: skip GUI backend probing
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
 
+try:
+    from tsdownsample import NaNMinMaxLTTBDownsampler
+except ImportError:  # optional: plot every point if tsdownsample is not installed
+    NaNMinMaxLTTBDownsampler = None
+
 CANDIDATE_TIME_COLS = ["time", "timestamp", "date", "datetime", "Time", "Timestamp", "Date", "Datetime"]
+# Above this many points the line is rasterized instead of drawn as a vector path
+RASTERIZE_MIN_POINTS = 50_000
+# Series longer than this are downsampled to DOWNSAMPLE_POINTS before plotting
+DOWNSAMPLE_MIN_POINTS = 4000
+DOWNSAMPLE_POINTS = 2000
+
+def downsample(x, y, n_out: int = DOWNSAMPLE_POINTS):
+    """Reduce a long (x, y) line to ~n_out points with MinMaxLTTB (no-op without tsdownsample).
+
+    NaN samples are kept in the output so gaps still draw as breaks in the line.
+    """
+    if NaNMinMaxLTTBDownsampler is None or len(y) <= DOWNSAMPLE_MIN_POINTS:
+        return x, y
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    if np.issubdtype(x.dtype, np.datetime64):
+        idx = NaNMinMaxLTTBDownsampler().downsample(x.view("i8"), y, n_out=n_out)
+    else:
+        idx = NaNMinMaxLTTBDownsampler().downsample(y, n_out=n_out)
+    return x[idx], y[idx]
 
 def detect_time_col(df: pd.DataFrame, forced: Optional[str] = None) -> str:
     if forced and forced in df.columns:
@@ -56,74 +95,118 @@ def pick_metric_col(df: pd.DataFrame, time_col: str, metric: Optional[str]) -> s
             return preferred
     return numeric_cols[0]
 
-def main():
-    ap = argparse.ArgumentParser(description="Plot pmrep CSV (e.g., ds389.cn.opscompleted) into PNG/PDF.")
-    ap.add_argument("--csv", required=True, help="Path to pmrep --csv file")
-    ap.add_argument("--out-dir", required=True, help="Directory to save outputs")
-    ap.add_argument("--pdf", default=None, help="Optional PDF path for the figure")
-    ap.add_argument("--time-col", default=None, help="Time column name if auto-detect fails")
-    ap.add_argument("--metric", default=None, help="Metric column to plot (defaults to first numeric)")
-    ap.add_argument("--resample", default=None, help="Optional pandas offset alias (e.g., '1min', '30s')")
-    ap.add_argument("--rolling", type=int, default=None, help="Optional rolling window (in samples after resample)")
-    args = ap.parse_args()
-
-    out_dir = Path(args.out_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
-
-    # Load CSV
-    df = pd.read_csv(args.csv)
-
-    # Detect columns
-    time_col = detect_time_col(df, args.time_col)
-    try:
-        df[time_col] = pd.to_datetime(df[time_col])
-    except Exception:
-        # leave as-is if parsing fails
-        pass
+def read_csv_list(path: str) -> List[str]:
+    """CSV paths from a --csv-list file: one per line, blank lines and #comments skipped."""
+    with open(path) as fh:
+        return [ln.strip() for ln in fh if ln.strip() and not ln.lstrip().startswith("#")]
+
+def plot_csv(csv_path: str, args: argparse.Namespace, fig, ax, pdf: Optional[PdfPages] = None) -> Path:
+    """Draw one pmrep CSV onto a cleared ax, save the PNG into --out-dir and return its path."""
+    # Detect columns from the header, then load with the Arrow reader so the
+    # time column is parsed while reading (left as-is if parsing fails)
+    header = pd.read_csv(csv_path, nrows=0)
+    time_col = detect_time_col(header, args.time_col)
+    df = pd.read_csv(csv_path, engine="pyarrow", parse_dates=[time_col], date_format=args.time_format)
     metric_col = pick_metric_col(df, time_col, args.metric)
+    is_dt = pd.api.types.is_datetime64_any_dtype(df[time_col])
+    if is_dt:
+        # Arrow returns datetime64[s]; sub-second resample needs ns resolution
+        df[time_col] = df[time_col].dt.as_unit("ns")
 
-    # Prepare series
-    x = df[time_col]
-    y = df[metric_col]
+    # Prepare series (plain arrays unless resampling/smoothing needs a Series)
+    x = df[time_col].values
+    y = df[metric_col].values
 
     # Optional resampling (requires datetime-like index)
-    if pd.api.types.is_datetime64_any_dtype(x):
-        s = pd.Series(y.values, index=x)
+    smooth = args.rolling and args.rolling > 1
+    if is_dt and (args.resample or smooth):
+        s = pd.Series(y, index=x)
         if args.resample:
             # For counts like opscompleted, sum per bucket generally makes sense;
             # change to 'mean' if you prefer average over the interval.
             s = s.resample(args.resample).sum()
-        else:
-            s = s
-        if args.rolling and args.rolling > 1:
+        if smooth:
             s = s.rolling(args.rolling, min_periods=1).mean()
-        x = s.index
-        y = s.values
+        x, y = s.index, s.values
+
+    x, y = downsample(x, y)
 
     # Plot (one chart, no explicit colors)
-    fig, ax = plt.subplots(figsize=(10, 4))
-    ax.plot(x, y, linewidth=1.5)
+    ax.plot(x, y, linewidth=1.5, rasterized=len(y) > RASTERIZE_MIN_POINTS)
     ax.set_title(metric_col)
     ax.set_xlabel(time_col)
     ax.set_ylabel(metric_col)
     ax.grid(True, which="both", linestyle="--", alpha=0.5)
-    if pd.api.types.is_datetime64_any_dtype(x):
+    if is_dt:
         fig.autofmt_xdate()
-    plt.tight_layout()
+    fig.tight_layout()
 
     # Save files
-    png_path = out_dir / f"{Path(args.csv).stem}.{metric_col.replace('/', '_')}.png"
+    png_path = Path(args.out_dir) / f"{Path(csv_path).stem}.{metric_col.replace('/', '_')}.png"
     fig.savefig(png_path, dpi=140)
+    if pdf is not None:
+        pdf.savefig(fig, bbox_inches='tight')
+    return png_path
 
+def plot_one(csv_path: str, args: argparse.Namespace) -> Path:
+    """Pool worker: plot one CSV on its own figure and return the PNG path."""
+    fig, ax = plt.subplots(figsize=(10, 4))
+    try:
+        return plot_csv(csv_path, args, fig, ax)
+    finally:
+        plt.close(fig)
+
+def main():
+    ap = argparse.ArgumentParser(description="Plot pmrep CSV (e.g., ds389.cn.opscompleted) into PNG/PDF.")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--csv", help="Path to pmrep --csv file")
+    src.add_argument("--csv-list", help="File with one CSV path per line, all plotted in one process")
+    src.add_argument("--csv-glob", help="Glob of CSV paths, plotted in parallel (see --jobs)")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count(), help="Worker processes for --csv-glob (default: CPU count)")
+    ap.add_argument("--out-dir", required=True, help="Directory to save outputs")
+    ap.add_argument("--pdf", default=None, help="Optional PDF path for the figure (one page per CSV)")
+    ap.add_argument("--time-col", default=None, help="Time column name if auto-detect fails")
+    ap.add_argument("--time-format", default="%Y-%m-%d %H:%M:%S", help="strftime format of the time column (pmrep default)")
+    ap.add_argument("--metric", default=None, help="Metric column to plot (defaults to first numeric)")
+    ap.add_argument("--resample", default=None, help="Optional pandas offset alias (e.g., '1min', '30s')")
+    ap.add_argument("--rolling", type=int, default=None, help="Optional rolling window (in samples after resample)")
+    args = ap.parse_args()
+    if args.csv_glob and args.pdf:
+        ap.error("--pdf cannot be combined with --csv-glob (pages would come from separate processes)")
+
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    if args.csv_glob:
+        # Each worker imports this module, so it runs on the Agg backend selected above
+        csv_paths = sorted(glob.glob(args.csv_glob))
+        if not csv_paths:
+            raise SystemExit(f"No CSV files match --csv-glob '{args.csv_glob}'")
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            for png_path in pool.map(plot_one, csv_paths, repeat(args)):
+                print(f"PNG saved: {png_path}")
+        return
+
+    csv_paths = [args.csv] if args.csv else read_csv_list(args.csv_list)
+
+    pdf = None
     if args.pdf:
         pdf_dir = Path(args.pdf).parent
         pdf_dir.mkdir(parents=True, exist_ok=True)
-        with PdfPages(args.pdf) as pdf:
-            pdf.savefig(fig, bbox_inches='tight')
+        pdf = PdfPages(args.pdf)
 
-    plt.close(fig)
+    # One figure reused for every CSV: matplotlib init is paid once per process
+    fig, ax = plt.subplots(figsize=(10, 4))
+    try:
+        for csv_path in csv_paths:
+            ax.clear()
+            png_path = plot_csv(csv_path, args, fig, ax, pdf)
+            print(f"PNG saved: {png_path}")
+    finally:
+        if pdf is not None:
+            pdf.close()
+        plt.close(fig)
 
-    print(f"PNG saved: {png_path}")
     if args.pdf:
         print(f"PDF saved: {args.pdf}")
 
@@ -10,6 +10,8 @@ Features
 - Vertical line at first predicted timestamp.
 - Optional resample and rolling smoothing.
 - Optional confidence band if columns like lower/upper or yhat_lower/yhat_upper exist.
+- Optional --csv-list FILE to plot many CSVs in one process, reusing a single figure.
+- Optional --csv-glob PATTERN --jobs N to plot many CSVs in parallel worker processes.
 
 Usage
 python3 plot_split_by_label.py \
@@ -18,15 +20,82 @@ python3 plot_split_by_label.py \
   --label-col type --predicted-label predicted \
   --out ./plots/ops_obs_pred.png --pdf ./plots/ops_obs_pred.pdf \
   --resample 1min --rolling 5
+
+# Batch: one PNG per CSV listed in csvs.txt, written to ./plots/<csv stem>.png
+python3 plot_split_by_label.py --csv-list csvs.txt \
+  --label-col type --predicted-label predicted --out ./plots
+
+# Parallel: every matching CSV, 8 worker processes, written to ./plots/<csv stem>.png
+python3 plot_split_by_label.py --csv-glob '/tmp/forecast_*.csv' --jobs 8 \
+  --label-col type --predicted-label predicted --out ./plots
 """
 import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # headless: skip GUI backend probing
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
 
+try:
+    from tsdownsample import NaNMinMaxLTTBDownsampler
+except ImportError:  # optional: plot every point if tsdownsample is not installed
+    NaNMinMaxLTTBDownsampler = None
+
+# Above this many points a line is rasterized instead of drawn as a vector path
+RASTERIZE_MIN_POINTS = 50_000
+# Series longer than this are downsampled to DOWNSAMPLE_POINTS before plotting
+DOWNSAMPLE_MIN_POINTS = 4000
+DOWNSAMPLE_POINTS = 2000
+DAY_NS = 86_400 * 10**9
+
+def downsample(x, y, n_out: int = DOWNSAMPLE_POINTS):
+    """Reduce a long (x, y) line to ~n_out points with MinMaxLTTB (no-op without tsdownsample).
+
+    NaN samples are kept in the output so gaps still draw as breaks in the line.
+    """
+    if NaNMinMaxLTTBDownsampler is None or len(y) <= DOWNSAMPLE_MIN_POINTS:
+        return x, y
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    if np.issubdtype(x.dtype, np.datetime64):
+        idx = NaNMinMaxLTTBDownsampler().downsample(x.view("i8"), y, n_out=n_out)
+    else:
+        idx = NaNMinMaxLTTBDownsampler().downsample(y, n_out=n_out)
+    return x[idx], y[idx]
+
+def fixed_step_ns(freq: str) -> Optional[int]:
+    """Bucket width in ns if freq is a fixed duration that evenly divides a day, else None."""
+    # Parse like resample() does, so both paths agree on the bucket width ('1m' is not a minute)
+    try:
+        off = pd.tseries.frequencies.to_offset(freq)
+    except ValueError:
+        return None
+    if not isinstance(off, pd.offsets.Tick):
+        return None
+    step_ns = pd.Timedelta(off).value
+    return step_ns if step_ns > 0 and DAY_NS % step_ns == 0 else None
+
+def fast_resample_sum(times_i8: np.ndarray, vals: np.ndarray, step_ns: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Equivalent of Series.resample(step).sum() for sorted int64 ns times.
+
+    Returns (sums, bucket start times in ns) on the full grid; empty buckets sum to 0.
+    """
+    if vals.dtype.kind == "f":
+        vals = np.where(np.isnan(vals), 0, vals)
+    buckets = times_i8 // step_ns
+    edges = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    sums = np.zeros(buckets[-1] - buckets[0] + 1, dtype=vals.dtype)
+    sums[buckets[edges] - buckets[0]] = np.add.reduceat(vals, edges)
+    return sums, (buckets[0] + np.arange(len(sums), dtype=np.int64)) * step_ns
+
 def detect_time_col(df: pd.DataFrame, forced: Optional[str]) -> str:
     if forced and forced in df.columns:
         return forced
@@ -60,100 +129,94 @@ def find_ci_columns(df: pd.DataFrame, base: str):
             return lo, hi
     return None, None
 
-def main():
-    ap = argparse.ArgumentParser(description="Plot observed vs predicted rows from a single CSV by label.")
-    ap.add_argument("--csv", required=True)
-    ap.add_argument("--time-col", default=None)
-    ap.add_argument("--value-col", default=None)
-    ap.add_argument("--label-col", required=True, help="Column that marks observed/predicted rows")
-    ap.add_argument("--predicted-label", required=True, help="Value in --label-col that denotes forecast rows")
-    ap.add_argument("--out", required=True)
-    ap.add_argument("--pdf", default=None)
-    ap.add_argument("--resample", default=None, help="Pandas offset alias (e.g., '1min', '30s')")
-    ap.add_argument("--resample-agg", default="sum", choices=["sum", "mean", "max", "min"])
-    ap.add_argument("--rolling", type=int, default=None, help="Rolling mean window after resample")
-    ap.add_argument("--observed-color", default="#1f77b4")
-    ap.add_argument("--predicted-color", default="#d62728")
-    args = ap.parse_args()
+def read_csv_list(path: str) -> List[str]:
+    """CSV paths from a --csv-list file: one per line, blank lines and #comments skipped."""
+    with open(path) as fh:
+        return [ln.strip() for ln in fh if ln.strip() and not ln.lstrip().startswith("#")]
 
-    df = pd.read_csv(args.csv)
-    tcol = detect_time_col(df, args.time_col)
-    try:
-        df[tcol] = pd.to_datetime(df[tcol])
-    except Exception:
-        pass
+def plot_csv(csv_path: str, out_path: Path, args: argparse.Namespace, fig, ax,
+             pdf: Optional[PdfPages] = None) -> None:
+    """Draw one observed/predicted CSV onto a cleared ax and save it to out_path (and pdf)."""
+    # Header first to detect the time column, then a typed Arrow read
+    header = pd.read_csv(csv_path, nrows=0)
+    tcol = detect_time_col(header, args.time_col)
+    if args.label_col not in header.columns:
+        raise SystemExit(f"--label-col '{args.label_col}' not found in CSV columns: {list(header.columns)}")
+    df = pd.read_csv(csv_path, engine="pyarrow", parse_dates=[tcol], date_format=args.time_format)
     vcol = detect_value_col(df, tcol, args.value_col)
+    is_dt = pd.api.types.is_datetime64_any_dtype(df[tcol])
+    if is_dt:
+        # Arrow returns datetime64[s]; sub-second resample needs ns resolution
+        df[tcol] = df[tcol].dt.as_unit("ns")
 
-    if args.label_col not in df.columns:
-        raise SystemExit(f"--label-col '{args.label_col}' not found in CSV columns: {list(df.columns)}")
-
-    # Split observed vs predicted
-    is_pred = df[args.label_col].astype(str).str.lower() == str(args.predicted_label).lower()
+    # Split observed vs predicted: lowercase the few distinct labels, then compare integer codes per row
+    labels = df[args.label_col].astype("category")
+    categories = labels.cat.categories.astype(str).str.lower()
+    pred_codes = np.flatnonzero(categories == str(args.predicted_label).lower())
+    is_pred = np.isin(labels.cat.codes.to_numpy(), pred_codes)
     df_obs = df.loc[~is_pred, [tcol, vcol]].copy()
     df_pred = df.loc[is_pred, [tcol, vcol]].copy()
 
     # Optional resample & rolling
+    freq = args.resample
+    agg = args.resample_agg
+    # Day-aligned fixed buckets match pandas' default origin, so "sum" can skip the GroupBy machinery
+    sum_step_ns = fixed_step_ns(freq) if freq and agg == "sum" else None
+
+    def resample(s: pd.Series) -> pd.Series:
+        idx = s.index
+        if (sum_step_ns is not None and len(s) and idx.tz is None
+                and not idx.hasnans and idx.is_monotonic_increasing):
+            sums, starts = fast_resample_sum(idx.as_unit("ns").asi8, s.to_numpy(), sum_step_ns)
+            return pd.Series(sums, index=pd.DatetimeIndex(starts.view("datetime64[ns]"), name=idx.name))
+        return getattr(s.resample(freq), agg)()
+
+    # Smoothing decided once: a rolling mean, or the identity when disabled
+    window = args.rolling
+    roll = (lambda s: s.rolling(window, min_periods=1).mean()) if window and window > 1 else (lambda s: s)
+
     def process(ts_df: pd.DataFrame):
         x = ts_df[tcol]
         y = ts_df[vcol]
-        if pd.api.types.is_datetime64_any_dtype(x):
+        if is_dt:
             s = pd.Series(y.values, index=x)
-            if args.resample:
-                if args.resample_agg == "sum":
-                    s = s.resample(args.resample).sum()
-                elif args.resample_agg == "mean":
-                    s = s.resample(args.resample).mean()
-                elif args.resample_agg == "max":
-                    s = s.resample(args.resample).max()
-                elif args.resample_agg == "min":
-                    s = s.resample(args.resample).min()
-            if args.rolling and args.rolling > 1:
-                s = s.rolling(args.rolling, min_periods=1).mean()
-            return s
+            if not s.index.is_monotonic_increasing:
+                s = s.sort_index()
+            if freq:
+                s = resample(s)
+            return roll(s)
         return pd.Series(y.values, index=x)
 
     s_obs = process(df_obs)
     s_pred = process(df_pred)
 
-    # Build aligned df (to find forecast start and align x-axis)
-    aligned = pd.concat({"Observed": s_obs, "Predicted": s_pred}, axis=1)
-
     # CI band (optional, if present in CSV)
     lo_col, hi_col = find_ci_columns(df, vcol)
-    ci = None
-    if lo_col and hi_col and pd.api.types.is_datetime64_any_dtype(aligned.index):
-        s_lo = pd.Series(df.loc[is_pred, lo_col].values, index=df.loc[is_pred, tcol])
-        s_hi = pd.Series(df.loc[is_pred, hi_col].values, index=df.loc[is_pred, tcol])
-        if args.resample:
-            agg = args.resample_agg
-            if agg == "sum":
-                s_lo = s_lo.resample(args.resample).sum()
-                s_hi = s_hi.resample(args.resample).sum()
-            elif agg == "mean":
-                s_lo = s_lo.resample(args.resample).mean()
-                s_hi = s_hi.resample(args.resample).mean()
-            elif agg == "max":
-                s_lo = s_lo.resample(args.resample).max()
-                s_hi = s_hi.resample(args.resample).max()
-            elif agg == "min":
-                s_lo = s_lo.resample(args.resample).min()
-                s_hi = s_hi.resample(args.resample).min()
-        if args.rolling and args.rolling > 1:
-            s_lo = s_lo.rolling(args.rolling, min_periods=1).mean()
-            s_hi = s_hi.rolling(args.rolling, min_periods=1).mean()
-        ci = pd.concat({"lo": s_lo, "hi": s_hi}, axis=1)
-
-    # Forecast start (first valid predicted index)
-    f_start = aligned["Predicted"].first_valid_index()
-
-    # Plot
-    fig, ax = plt.subplots(figsize=(11, 4.5))
-    ax.plot(aligned.index, aligned["Observed"], linewidth=1.5, label="Observed", color=args.observed_color)
-    ax.plot(aligned.index, aligned["Predicted"], linewidth=1.5, label="Predicted", color=args.predicted_color)
+    s_lo = s_hi = None
+    if lo_col and hi_col and is_dt:
+        s_lo = pd.Series(df.loc[is_pred, lo_col].values, index=df.loc[is_pred, tcol]).sort_index()
+        s_hi = pd.Series(df.loc[is_pred, hi_col].values, index=df.loc[is_pred, tcol]).sort_index()
+        if freq:
+            s_lo = resample(s_lo)
+            s_hi = resample(s_hi)
+        s_lo = roll(s_lo)
+        s_hi = roll(s_hi)
+
+    # Forecast start (earliest predicted timestamp, taken straight from the label mask)
+    pred_times = df_pred[tcol]
+    f_start = pred_times.min() if not pred_times.empty else None
 
-    if ci is not None:
-        ci = ci.reindex(aligned.index)
-        ax.fill_between(ci.index, ci["lo"], ci["hi"], alpha=0.2, color=args.predicted_color, label="Prediction CI")
+    # Plot (each series on its own index; matplotlib shares the x-axis without aligning them)
+    x_obs, y_obs = downsample(s_obs.index, s_obs.values)
+    x_pred, y_pred = downsample(s_pred.index, s_pred.values)
+    ax.plot(x_obs, y_obs, linewidth=1.5, label="Observed", color=args.observed_color,
+            rasterized=len(y_obs) > RASTERIZE_MIN_POINTS)
+    ax.plot(x_pred, y_pred, linewidth=1.5, label="Predicted", color=args.predicted_color,
+            rasterized=len(y_pred) > RASTERIZE_MIN_POINTS)
+
+    if s_lo is not None:
+        ax.fill_between(s_lo.index, s_lo.values, s_hi.values, alpha=0.2, color=args.predicted_color,
+                        label="Prediction CI")
 
     if f_start is not None:
         ax.axvline(f_start, linestyle='--')
@@ -162,20 +225,76 @@ def main():
     ax.set_xlabel(tcol)
     ax.set_ylabel(vcol)
     ax.grid(True, which="both", linestyle="--", alpha=0.5)
-    if pd.api.types.is_datetime64_any_dtype(aligned.index):
+    if is_dt:
         fig.autofmt_xdate()
     ax.legend(loc="best")
-    plt.tight_layout()
+    fig.tight_layout()
 
-    out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
     fig.savefig(out_path, dpi=140)
-    if args.pdf:
-        with PdfPages(args.pdf) as pdf:
-            pdf.savefig(fig, bbox_inches='tight')
-    plt.close(fig)
+    if pdf is not None:
+        pdf.savefig(fig, bbox_inches='tight')
+
+def plot_one(csv_path: str, out_path: Path, args: argparse.Namespace) -> Path:
+    """Pool worker: plot one CSV on its own figure and return the PNG path."""
+    fig, ax = plt.subplots(figsize=(11, 4.5))
+    try:
+        plot_csv(csv_path, out_path, args, fig, ax)
+        return out_path
+    finally:
+        plt.close(fig)
+
+def main():
+    ap = argparse.ArgumentParser(description="Plot observed vs predicted rows from a single CSV by label.")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--csv")
+    src.add_argument("--csv-list", help="File with one CSV path per line, all plotted in one process (--out is then a directory)")
+    src.add_argument("--csv-glob", help="Glob of CSV paths, plotted in parallel (see --jobs; --out is then a directory)")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count(), help="Worker processes for --csv-glob (default: CPU count)")
+    ap.add_argument("--time-col", default=None)
+    ap.add_argument("--time-format", default="%Y-%m-%d %H:%M:%S", help="strftime format of the time column (pmrep default)")
+    ap.add_argument("--value-col", default=None)
+    ap.add_argument("--label-col", required=True, help="Column that marks observed/predicted rows")
+    ap.add_argument("--predicted-label", required=True, help="Value in --label-col that denotes forecast rows")
+    ap.add_argument("--out", required=True)
+    ap.add_argument("--pdf", default=None, help="Optional PDF path (one page per CSV)")
+    ap.add_argument("--resample", default=None, help="Pandas offset alias (e.g., '1min', '30s')")
+    ap.add_argument("--resample-agg", default="sum", choices=["sum", "mean", "max", "min"])
+    ap.add_argument("--rolling", type=int, default=None, help="Rolling mean window after resample")
+    ap.add_argument("--observed-color", default="#1f77b4")
+    ap.add_argument("--predicted-color", default="#d62728")
+    args = ap.parse_args()
+    if args.csv_glob and args.pdf:
+        ap.error("--pdf cannot be combined with --csv-glob (pages would come from separate processes)")
+
+    if args.csv_glob:
+        # Each worker imports this module, so it runs on the Agg backend selected above
+        csv_paths = sorted(glob.glob(args.csv_glob))
+        if not csv_paths:
+            raise SystemExit(f"No CSV files match --csv-glob '{args.csv_glob}'")
+        out_paths = [Path(args.out) / f"{Path(p).stem}.png" for p in csv_paths]
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            for out_path in pool.map(plot_one, csv_paths, out_paths, repeat(args)):
+                print(f"PNG saved: {out_path}")
+        return
+
+    # One figure reused for every CSV: matplotlib init is paid once per process
+    if args.csv:
+        targets = [(args.csv, Path(args.out))]
+    else:
+        targets = [(p, Path(args.out) / f"{Path(p).stem}.png") for p in read_csv_list(args.csv_list)]
+    fig, ax = plt.subplots(figsize=(11, 4.5))
+    pdf = PdfPages(args.pdf) if args.pdf else None
+    try:
+        for csv_path, out_path in targets:
+            ax.clear()
+            plot_csv(csv_path, out_path, args, fig, ax, pdf)
+            print(f"PNG saved: {out_path}")
+    finally:
+        if pdf is not None:
+            pdf.close()
+        plt.close(fig)
 
-    print(f"PNG saved: {out_path}")
     if args.pdf:
         print(f"PDF saved: {args.pdf}")
 
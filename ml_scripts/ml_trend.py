@@ -3,78 +3,178 @@ import argparse
 import sys
 import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+# Below this many points pandas' ffill is cheaper than importing numba and loading the compiled loop
+NUMBA_FFILL_MIN_POINTS = 100_000
 
 def fail(msg: str):
     print(f"[ERROR] {msg}", file=sys.stderr)
     sys.exit(1)
 
+def clean_frame(df: pd.DataFrame, time_format: str) -> pd.DataFrame:
+    """Rows indexed by sorted, unique Time; unparseable times dropped."""
+    if not pd.api.types.is_datetime64_any_dtype(df["Time"]):
+        # The reader could not type the column as a whole; coerce the bad rows to NaT
+        df["Time"] = pd.to_datetime(df["Time"], format=time_format, errors="coerce", utc=False)
+    # Arrow returns datetime64[s]; sub-second resample needs ns resolution
+    df["Time"] = df["Time"].dt.as_unit("ns")
+    df = df.dropna(subset=["Time"])
+    if not df["Time"].is_monotonic_increasing:
+        df = df.sort_values("Time", kind="stable")
+    # Sorted, so duplicates are adjacent: keep the first of each run (slice keeps an empty frame empty)
+    t = df["Time"].to_numpy()
+    return df.iloc[np.r_[True, t[1:] != t[:-1]][:len(t)]].set_index("Time")
+
+def _ffill_loop(a):
+    last = a[0]
+    for i in range(1, a.size):
+        if np.isnan(a[i]):
+            a[i] = last
+        else:
+            last = a[i]
+
+_ffill_compiled = None
+
+def ffill(s: pd.Series) -> pd.Series:
+    """Forward-fill NaN gaps of a float series; long series use a numba-compiled pass if numba is installed."""
+    global _ffill_compiled
+    if len(s) < NUMBA_FFILL_MIN_POINTS:
+        return s.ffill()
+    if _ffill_compiled is None:
+        try:
+            import numba  # optional and imported lazily: only long series pay its import cost
+        except ImportError:
+            return s.ffill()
+        _ffill_compiled = numba.njit(cache=True)(_ffill_loop)
+    vals = s.to_numpy(dtype=np.float64, copy=True)
+    _ffill_compiled(vals)
+    return pd.Series(vals, index=s.index, name=s.name)
+
 def main():
     ap = argparse.ArgumentParser(description="Linear trend + simple forecast for a PCP metric CSV.")
     ap.add_argument("--csv", required=True, help="Input CSV path from pmrep (must contain columns: Time,<metric>)")
     ap.add_argument("--metric", required=True, help="Exact metric column name in the CSV (e.g. ds389.cn.opscompleted)")
+    ap.add_argument("--time_format", default="%Y-%m-%d %H:%M:%S", help="strftime format of the Time column (pmrep default)")
     ap.add_argument("--interval", default="5min", help="Resample frequency (e.g. 1min, 5min, 30s)")
+    ap.add_argument("--chunksize", type=int, default=None, help="Stream the CSV in chunks of N rows to bound memory on very large exports")
     ap.add_argument("--horizon_hours", type=int, default=24, help="Forecast horizon in hours (default: 24)")
     ap.add_argument("--threshold", type=float, default=None, help="Optional target value to compute ETA")
     ap.add_argument("--out_forecast", default="/tmp/forecast.csv", help="Output CSV for observed+predicted series")
     args = ap.parse_args()
 
-    # --- Load
+    # --- Load (header only first, so missing columns get a clear error)
     try:
-        df = pd.read_csv(args.csv)
+        header = pd.read_csv(args.csv, nrows=0)
     except Exception as e:
         fail(f"Cannot read CSV {args.csv}: {e}")
 
-    if "Time" not in df.columns:
+    if "Time" not in header.columns:
         fail("CSV must have a 'Time' column.")
-    if args.metric not in df.columns:
+    if args.metric not in header.columns:
         fail(f"CSV does not contain metric column '{args.metric}'.")
 
-    # --- Parse & clean
-    df["Time"] = pd.to_datetime(df["Time"], errors="coerce", utc=False)
-    df = df.dropna(subset=["Time"])
-    df = df.sort_values("Time").drop_duplicates("Time").set_index("Time")
-
-    # Ensure metric numeric
-    s = pd.to_numeric(df[args.metric], errors="coerce").dropna()
-    if s.empty:
-        fail("No numeric data points found after cleaning.")
-
-    # Align to fixed grid and forward-fill to stabilize ML input
     try:
-        s = s.resample(args.interval).last().ffill()
-    except Exception as e:
+        interval_off = pd.tseries.frequencies.to_offset(args.interval)
+    except ValueError as e:
         fail(f"Invalid interval '{args.interval}': {e}")
 
+    # Decode only the two needed columns, already typed
+    read_opts = dict(
+        usecols=["Time", args.metric],
+        parse_dates=["Time"],
+        date_format=args.time_format,
+        dtype={args.metric: "float64"},
+    )
+
+    # --- Parse, clean & align to fixed grid (forward-filled to stabilize ML input)
+    if args.chunksize:
+        # Streaming: resample each chunk as it is read so memory stays bounded by the chunk size.
+        # The Arrow engine has no chunked mode, so this uses the C parser. Chunks must not go back
+        # in time, otherwise the per-chunk results would differ from the whole-file path.
+        pieces = []
+        last_time = None
+        try:
+            for chunk in pd.read_csv(args.csv, chunksize=args.chunksize, **read_opts):
+                frame = clean_frame(chunk, args.time_format)
+                if last_time is not None and not frame.empty:
+                    if frame.index[0] < last_time:
+                        fail(f"--chunksize needs a time-ordered CSV, but {frame.index[0]} follows {last_time}. "
+                             "Sort the file or run without --chunksize.")
+                    # Same timestamp as the previous chunk's last row: keep the first, like the whole-file path
+                    frame = frame[frame.index > last_time]
+                if frame.empty:
+                    continue
+                last_time = frame.index[-1]
+                # Metric is read as float64; empty/N/A samples arrive as NaN
+                pieces.append(frame[args.metric].dropna().resample(args.interval).last())
+        except Exception as e:
+            fail(f"Cannot read CSV {args.csv}: {e}")
+        # Buckets split across a chunk boundary are merged by keeping the later chunk's last value
+        s = pd.concat(pieces).resample(args.interval).last() if pieces else pd.Series(dtype="float64")
+        if s.isna().all():
+            fail("No numeric data points found after cleaning.")
+    else:
+        # Arrow reader for the whole file
+        try:
+            df = pd.read_csv(args.csv, engine="pyarrow", **read_opts)
+        except Exception as e:
+            fail(f"Cannot read CSV {args.csv}: {e}")
+
+        # Metric is read as float64; empty/N/A samples arrive as NaN
+        s = clean_frame(df, args.time_format)[args.metric].dropna()
+        if s.empty:
+            fail("No numeric data points found after cleaning.")
+        try:
+            s = s.resample(args.interval).last()
+        except Exception as e:
+            fail(f"Invalid interval '{args.interval}': {e}")
+    s = ffill(s)
+
     if len(s) < 3:
         fail("Not enough points after resampling (need >= 3).")
 
     # --- Prepare regression variables
     t0 = s.index[0]
-    # seconds since t0 -> hours
-    X = ((s.index - t0).total_seconds().to_numpy().reshape(-1, 1)) / 3600.0
+    # ns since t0 -> hours, straight from the int64 index
+    idx_ns = s.index.as_unit("ns").asi8
+    t0_ns = idx_ns[0]
+    X = ((idx_ns - t0_ns).astype(np.float64) / 3.6e12).reshape(-1, 1)
     y = s.to_numpy(dtype=float)
 
-    # --- Train linear regression
-    model = LinearRegression()
-    model.fit(X, y)
-    slope = float(model.coef_[0])       # units of metric per hour
-    intercept = float(model.intercept_)
-
-    # --- Forecast
-    freq_off = pd.tseries.frequencies.to_offset(args.interval)
-    step_seconds = pd.Timedelta(freq_off).total_seconds()
-    n_steps = max(int((args.horizon_hours * 3600) / step_seconds), 1)
-
-    future_idx = pd.date_range(s.index[-1] + freq_off, periods=n_steps, freq=freq_off)
-    Xf = ((future_idx - t0).total_seconds().to_numpy().reshape(-1, 1)) / 3600.0
-    y_pred = model.predict(Xf)
-
-    # --- Build output (observed + predicted)
-    out_hist = pd.DataFrame({"Time": s.index, "value": s.values, "type": "observed"})
-    out_pred = pd.DataFrame({"Time": future_idx, "value": y_pred, "type": "predicted"})
-    out = pd.concat([out_hist, out_pred], ignore_index=True)
-    out.to_csv(args.out_forecast, index=False)
+    # --- Fit linear regression (closed-form least squares for a single predictor)
+    x = X.ravel()
+    xm = x.mean()
+    ym = y.mean()
+    slope = float(((x - xm) * (y - ym)).sum() / ((x - xm) ** 2).sum())   # units of metric per hour
+    intercept = float(ym - slope * xm)
+
+    # --- Forecast (regular grid built directly on int64 nanoseconds)
+    try:
+        step_ns = pd.Timedelta(interval_off).value
+    except (ValueError, TypeError) as e:
+        fail(f"Interval '{args.interval}' is not a fixed duration: {e}")
+    n_steps = max(int((args.horizon_hours * 3600e9) / step_ns), 1)
+
+    future_ns = idx_ns[-1] + step_ns * np.arange(1, n_steps + 1, dtype=np.int64)
+    Xf = ((future_ns - t0_ns).astype(np.float64) / 3.6e12).reshape(-1, 1)
+    y_pred = intercept + slope * Xf.ravel()
+
+    # --- Build output (observed + predicted), Time kept as int64 ns until written
+    times_ns = np.concatenate([idx_ns, future_ns])
+    # Coarsest timestamp unit that still holds every grid point exactly (whole seconds for 1min, ms for 500ms)
+    unit, per_unit = next((u, d) for u, d in (("s", 10**9), ("ms", 10**6), ("us", 10**3), ("ns", 1))
+                          if step_ns % d == 0)
+    table = pa.table({
+        # reinterpreted as an Arrow timestamp without a copy
+        "Time": pa.array(times_ns // per_unit).cast(pa.timestamp(unit)),
+        "value": np.concatenate([y, y_pred]),
+        "type": np.repeat(["observed", "predicted"], [len(y), len(y_pred)]),
+    })
+    # Arrow's C++ writer. Labels are fixed tokens, so they are written unquoted. Unlike pandas,
+    # Arrow still quotes the header names and writes whole floats without ".0" (123, not 123.0).
+    pa_csv.write_csv(table, args.out_forecast, write_options=pa_csv.WriteOptions(quoting_style="none"))
 
     print(f"Trend slope (per hour): {slope:.6f}")
     print(f"Intercept: {intercept:.6f}")